@@ -18,6 +18,9 @@ class MessageEncrypter:
         for i, char in enumerate(message):
             key_char = self.encryption_key[i % key_len]
             encrypted_byte = ord(char) ^ ord(key_char)
+            if encrypted_byte > 255:
+                # One byte per character - the ESP32 decrypts byte for byte
+                raise ValueError(f"Can't encrypt {char!r}: only Latin-1 characters (U+0000-U+00FF) are supported")
             encrypted_bytes.append(encrypted_byte)
         
         # Convert to hex string
@@ -27,7 +30,8 @@ class MessageEncrypter:
     def decrypt_message(self, hex_string):
         """Decrypt a hex string back to readable text (for testing)"""
         try:
-            # Convert hex to bytes
+            # Drop whitespace/newlines like the ESP32 does, then convert hex to bytes
+            hex_string = "".join(hex_string.split())
             encrypted_bytes = binascii.unhexlify(hex_string)
             
             # XOR decrypt
@@ -75,7 +79,11 @@ def main():
             message = input("Enter your message: ")
             
             if message:
-                encrypted = encrypter.encrypt_message(message)
+                try:
+                    encrypted = encrypter.encrypt_message(message)
+                except ValueError as e:
+                    print(f"❌ {e}")
+                    continue
                 print(f"\n✅ ENCRYPTED MESSAGE (copy this to GitHub):")
                 print(f"{'='*60}")
                 print(encrypted)
@@ -6,6 +6,10 @@
 # - PWM buzzer for music playback
 # - WiFi connectivity to fetch messages
 # - XOR encryption for messages
+# - Per-device messages published with a hash manifest (see publish.py)
+# - Frame-capped display compositor that only redraws between notes
+# - Optional network worker thread (WiFi, fetch, decrypt on the other core)
+# - Optional heap-budget mode (preallocated buffers, GC only at safe points)
 
 from machine import Pin, PWM, I2C
 import time
@@ -14,6 +18,13 @@ import ssd1306
 import network
 import urequests
 import binascii
+import gc
+import hashlib
+
+try:
+    import _thread
+except ImportError:
+    _thread = None  # Port built without threading - network stays on the main loop
 
 # Pin definitions
 BUTTON_PIN = 2
@@ -32,9 +43,44 @@ WIFI_NETWORKS = {
 # GitHub raw URL for the message
 MESSAGE_URL = "https://raw.githubusercontent.com/0x0elliot/message-for-sal/main/message.txt"
 
-# XOR encryption key (must match the Python encrypter key)
+# Fleet mode: set DEVICE_ID to fetch messages/<DEVICE_ID>.txt published by
+# publish.py. The manifest is checked first and the message is only
+# downloaded when this device's hash changed. None uses MESSAGE_URL.
+DEVICE_ID = None
+MESSAGES_BASE_URL = "https://raw.githubusercontent.com/0x0elliot/message-for-sal/main/messages/"
+MANIFEST_URL = MESSAGES_BASE_URL + "manifest.json"
+
+# XOR encryption key (must match the Python encrypter key, per device in fleet mode)
 ENCRYPTION_KEY = "SaloniKey2025"  # not in prod lol
 
+# Display text limits
+LINE_WIDTH = 21  # OLED character limit per line
+MAX_LINES = 4    # OLED height limitation
+DEFAULT_MESSAGE_LINES = ["HBD Saloni", "   <3"]
+
+# Heap-budget mode: preallocate working buffers at startup and only run
+# garbage collection at safe points (between songs, after a fetch)
+HEAP_BUDGET_MODE = False
+FETCH_BUFFER_SIZE = 512                    # max encrypted hex bytes read per fetch
+DECRYPT_BUFFER_SIZE = FETCH_BUFFER_SIZE // 2
+DRAIN_BUFFER_SIZE = 64                     # scratch for reading past a full fetch buffer
+GC_EMERGENCY_FREE = 4096                   # collect anyway if free heap drops below this
+
+# Render pipeline: state changes mark the view dirty, the compositor redraws
+# at most once per FRAME_INTERVAL_MS and only when the next note is at least
+# SHOW_BUDGET_MS away (a full show() is ~1 KB over 100 kHz I2C)
+FRAME_INTERVAL_MS = 200
+SHOW_BUDGET_MS = 120
+
+# Network thread mode: a background thread owns WiFi supervision, fetching and
+# decryption and hands wrapped lines to the main loop through a single-slot
+# mailbox, so messages can refresh during playback
+NETWORK_THREAD_MODE = False
+NETWORK_POLL_MS = 500
+# The default thread stack (~4 KB on ESP32) overflows during the TLS handshake
+# in urequests; 16 KB leaves headroom for mbedTLS plus the HTTP/JSON parsing
+NETWORK_THREAD_STACK = 16 * 1024
+
 # Complete Happy Birthday Melody (in Hz) - Key of C
 melody1 = [
     # "Happy birthday to you" (1st time)
@@ -134,7 +180,8 @@ class MusicPlayer:
         self.last_button = True
         
         # Message state
-        self.message_lines = ["HBD Saloni", "   <3"]
+        self.message_lines = list(DEFAULT_MESSAGE_LINES)
+        self.line_count = len(self.message_lines)
         self.wifi_connected = False
         self.last_wifi_check = 0
         self.wifi_check_interval = 10000  # 10 seconds in milliseconds
@@ -142,9 +189,39 @@ class MusicPlayer:
         self.wifi_connect_start = 0
         self.wifi_connect_timeout = 5000  # 5 second timeout
         self.last_message_fetch = 0
+        self.message_hash = None  # Last applied manifest hash (fleet mode)
         self.message_fetch_interval = 600000  # 10 minutes in milliseconds
         # self.message_fetch_interval = 5000
         
+        # Heap-budget state
+        self.heap_budget = HEAP_BUDGET_MODE
+        self.heap_high_water = 0
+        self.gc_paused = False  # Automatic GC disabled for playback
+        if self.heap_budget:
+            self.fetch_buf = bytearray(FETCH_BUFFER_SIZE)
+            self.decrypt_buf = bytearray(DECRYPT_BUFFER_SIZE)
+            self.drain_buf = bytearray(DRAIN_BUFFER_SIZE)
+            self.key_bytes = bytes([ord(c) for c in ENCRYPTION_KEY])  # ord() like the encrypter
+            self.line_slots = [""] * MAX_LINES
+            gc.collect()
+            self.update_heap_high_water()
+        
+        # Render state
+        self.view_dirty = False
+        self.last_frame_time = time.ticks_ms()
+        self.frames_shown = 0
+        self.frames_dropped = 0
+        
+        # Network thread state
+        self.network_thread = NETWORK_THREAD_MODE and _thread is not None
+        self.network_running = False
+        self.mailbox = None  # Wrapped lines waiting for the main loop, newest wins
+        self.wifi_changed = False  # WiFi status changed since the main loop last looked
+        self.mailbox_lock = _thread.allocate_lock() if self.network_thread else None
+        self.fetch_pending = False  # Fetch deferred until automatic GC is back on
+        self.network_busy = False  # Worker is mid-step (scan/fetch may be allocating)
+        self.gc_requested = False  # Worker finished a fetch - main loop should collect
+        
         print("ESP32 Birthday Player Ready!")
         self.display_message()  # Show default message first
     
@@ -196,7 +273,17 @@ class MusicPlayer:
             self.wifi_connected = True
             self.wifi_connecting = False
             print("Connected to WiFi!")
-            self.fetch_message()
+            if self.network_thread:
+                # Worker thread - the main loop owns the display state
+                self.post_wifi_changed()
+            else:
+                self.request_redraw()
+            
+            if self.gc_paused:
+                # Don't allocate for HTTPS while GC is held off - fetch after the song
+                self.fetch_pending = True
+            else:
+                self.fetch_message()
         elif time.ticks_diff(time.ticks_ms(), self.wifi_connect_start) >= self.wifi_connect_timeout:
             # Timeout - stop trying
             self.wifi_connecting = False
@@ -226,53 +313,205 @@ class MusicPlayer:
             print(f"XOR decryption error: {e}")
             return None
     
+    def xor_decrypt_into(self, length, complete=True):
+        """Hex-decode and XOR decrypt fetch_buf[:length] into decrypt_buf, returns byte count
+        
+        A body that didn't fit (complete=False) or a full decrypt_buf is truncated
+        at the last whole byte instead of being rejected.
+        """
+        src = self.fetch_buf
+        dst = self.decrypt_buf
+        key = self.key_bytes
+        key_len = len(key)
+        count = 0
+        high = -1
+        
+        for i in range(length):
+            c = src[i]
+            # Skip whitespace anywhere in the payload
+            if c == 32 or 9 <= c <= 13:
+                continue
+            
+            if 48 <= c <= 57:
+                nibble = c - 48
+            elif 97 <= (c | 0x20) <= 102:
+                nibble = (c | 0x20) - 87
+            else:
+                print("XOR decryption error: non-hex digit")
+                return 0
+            
+            if high < 0:
+                high = nibble
+            else:
+                dst[count] = ((high << 4) | nibble) ^ key[count % key_len]
+                count += 1
+                high = -1
+                if count >= len(dst):
+                    # Anything past the buffer can't fit on the display anyway
+                    return count
+        
+        if high >= 0 and complete:
+            print("XOR decryption error: odd-length hex string")
+            return 0
+        return count
+    
+    def read_response_into(self, response, hasher=None):
+        """Read the response body into fetch_buf without allocating
+        
+        Returns (length, complete) - complete is False when the body didn't fit.
+        With a hasher the rest of the body is still read (and hashed) past the buffer.
+        """
+        mv = memoryview(self.fetch_buf)
+        length = 0
+        while length < len(mv):
+            n = response.raw.readinto(mv[length:])
+            if not n:
+                break
+            length += n
+        
+        if hasher:
+            hasher.update(mv[:length])
+        if length < len(mv):
+            return length, True
+        
+        # Buffer is full - drain (or just probe for) the rest of the body
+        complete = True
+        drain = memoryview(self.drain_buf)
+        while True:
+            n = response.raw.readinto(drain)
+            if not n:
+                break
+            complete = False
+            if not hasher:
+                break
+            hasher.update(drain[:n])
+        return length, complete
+    
+    def digest_matches(self, hasher, digest):
+        """Check a sha256 hasher against the manifest's hex digest"""
+        return binascii.hexlify(hasher.digest()).decode() == digest
+    
+    def wrap_message(self, message_text):
+        """Split message into display lines, max LINE_WIDTH chars and MAX_LINES lines"""
+        lines = []
+        words = message_text.split()
+        current_line = ""
+        
+        for word in words:
+            if len(current_line + " " + word) <= LINE_WIDTH:
+                if current_line:
+                    current_line += " " + word
+                else:
+                    current_line = word
+            else:
+                if current_line:
+                    lines.append(current_line)
+                current_line = word
+        
+        if current_line:
+            lines.append(current_line)
+        
+        return lines[:MAX_LINES] if lines else list(DEFAULT_MESSAGE_LINES)
+    
+    def set_message_lines(self, lines):
+        """Store wrapped lines, reusing the preallocated line slots in heap-budget mode"""
+        self.line_count = len(lines)
+        if not self.heap_budget:
+            self.message_lines = lines
+            return
+        
+        # Unused slots are padded with empty strings; line_count says how many are live
+        slots = self.line_slots
+        for i in range(MAX_LINES):
+            slots[i] = lines[i] if i < self.line_count else ""
+        self.message_lines = slots
+    
+    def fetch_manifest_hash(self):
+        """Fetch this device's content hash from the manifest, None on failure"""
+        try:
+            response = urequests.get(MANIFEST_URL)
+            digest = None
+            if response.status_code == 200:
+                digest = response.json().get(DEVICE_ID)
+                if digest is None:
+                    print(f"Device {DEVICE_ID} not in manifest")
+            else:
+                print(f"Manifest HTTP error: {response.status_code}")
+            response.close()
+            del response  # Free memory
+            return digest
+        except Exception as e:
+            print(f"Error fetching manifest: {e}")
+            return None
+    
     def fetch_message(self):
         """Fetch and decrypt message from GitHub - memory efficient version"""
         if not self.wifi_connected:
             return
         
+        url = MESSAGE_URL
+        digest = None
+        if DEVICE_ID:
+            digest = self.fetch_manifest_hash()
+            if digest is None:
+                # Back off until the next poll - a missing id won't fix itself
+                self.last_message_fetch = time.ticks_ms()
+                return
+            if digest == self.message_hash:
+                # Nothing changed - skip the download
+                print("Message unchanged")
+                self.last_message_fetch = time.ticks_ms()
+                return
+            url = MESSAGES_BASE_URL + DEVICE_ID + ".txt"
+        
         try:
             print("Fetching message from GitHub...")
-            response = urequests.get(MESSAGE_URL)
+            response = urequests.get(url)
             
             if response.status_code == 200:
-                encrypted_hex = response.text.strip()
-                print("Fetched encrypted message")
+                # In fleet mode the body must match the manifest - raw.githubusercontent.com
+                # caches files separately, so a fresh manifest can come with a stale file
+                hasher = hashlib.sha256() if digest else None
                 
-                # Try to decrypt the message using XOR
-                message_text = self.xor_decrypt(encrypted_hex)
+                if self.heap_budget:
+                    # Read and decrypt straight into the preallocated buffers
+                    length, complete = self.read_response_into(response, hasher)
+                    print("Fetched encrypted message")
+                    verified = not hasher or self.digest_matches(hasher, digest)
+                    count = self.xor_decrypt_into(length, complete) if verified else 0
+                    message_text = "".join([chr(b) for b in self.decrypt_buf[:count]]) if count else None
+                else:
+                    body = response.content
+                    print("Fetched encrypted message")
+                    if hasher:
+                        hasher.update(body)
+                    verified = not hasher or self.digest_matches(hasher, digest)
+                    
+                    # Try to decrypt the message using XOR
+                    message_text = self.xor_decrypt(body.decode('utf-8')) if verified else None
                 
-                if message_text:
+                if not verified:
+                    # Stale CDN copy - keep the old hash so the next poll downloads again
+                    print("Message doesn't match manifest hash - will retry next poll")
+                    self.last_message_fetch = time.ticks_ms()
+                elif message_text:
                     print(f"Decrypted message: {message_text}")
                     
-                    # Split message into lines for display (max 21 chars per line for OLED)
-                    lines = []
-                    words = message_text.split()
-                    current_line = ""
+                    # Split message into lines for display
+                    lines = self.wrap_message(message_text)
+                    print(f"Message lines: {lines}")
                     
-                    for word in words:
-                        if len(current_line + " " + word) <= 21:  # OLED character limit
-                            if current_line:
-                                current_line += " " + word
-                            else:
-                                current_line = word
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                            current_line = word
-                    
-                    if current_line:
-                        lines.append(current_line)
-                    
-                    # Limit to 4 lines (OLED height limitation)
-                    self.message_lines = lines[:4] if lines else ["HBD Saloni", "   <3"]
-                    print(f"Message lines: {self.message_lines}")
-                    
-                    # Update display with new message
-                    self.display_message()
+                    if self.network_thread:
+                        # Hand off to the main loop - it owns the display state
+                        self.post_message_lines(lines)
+                    else:
+                        self.set_message_lines(lines)
+                        # Let the compositor pick up the new message
+                        self.request_redraw()
                     
                     # Update fetch timestamp
                     self.last_message_fetch = time.ticks_ms()
+                    self.message_hash = digest
                 else:
                     print("Failed to decrypt message - using default")
             else:
@@ -283,14 +522,209 @@ class MusicPlayer:
             
         except Exception as e:
             print(f"Error fetching message: {e}")
+        
+        if self.heap_budget:
+            if self.network_thread:
+                # Never collect on the worker - a song could start at any moment
+                self.post_gc_request()
+            elif not self.playing:
+                # After a fetch is a safe point to reclaim the request garbage
+                self.collect_garbage()
+    
+    def post_message_lines(self, lines):
+        """Network thread: put wrapped lines in the mailbox, replacing any unread ones"""
+        with self.mailbox_lock:
+            self.mailbox = lines
+    
+    def take_message_lines(self):
+        """Main loop: take wrapped lines from the mailbox, None if empty"""
+        with self.mailbox_lock:
+            lines = self.mailbox
+            self.mailbox = None
+        return lines
+    
+    def post_wifi_changed(self):
+        """Network thread: flag a WiFi status change for the main loop to draw"""
+        with self.mailbox_lock:
+            self.wifi_changed = True
+    
+    def take_wifi_changed(self):
+        """Main loop: read and clear the WiFi status change flag"""
+        with self.mailbox_lock:
+            changed = self.wifi_changed
+            self.wifi_changed = False
+        return changed
+    
+    def post_gc_request(self):
+        """Network thread: ask the main loop to collect the fetch garbage"""
+        with self.mailbox_lock:
+            self.gc_requested = True
+    
+    def take_gc_request(self):
+        """Main loop: read and clear the collection request"""
+        with self.mailbox_lock:
+            requested = self.gc_requested
+            self.gc_requested = False
+        return requested
+    
+    def poll_mailbox(self):
+        """Main loop: apply whatever the network thread finished and mark the view dirty"""
+        lines = self.take_message_lines()
+        if lines is not None:
+            self.set_message_lines(lines)
+            self.request_redraw()
+        if self.take_wifi_changed():
+            self.request_redraw()
+        # Collect here, on the main thread, only between songs - the song end collects anyway
+        if self.take_gc_request() and not self.playing:
+            self.collect_garbage()
+    
+    def begin_network_work(self):
+        """Network thread: claim a step, unless playback has automatic GC paused"""
+        with self.mailbox_lock:
+            if self.gc_paused:
+                return False
+            self.network_busy = True
+            return True
+    
+    def end_network_work(self):
+        """Network thread: release the step, applying a GC pause deferred while it ran"""
+        with self.mailbox_lock:
+            self.network_busy = False
+            if self.gc_paused:
+                gc.disable()
+    
+    def pause_gc(self):
+        """Disable automatic GC for playback - deferred while the worker is allocating"""
+        if not self.mailbox_lock:
+            gc.disable()
+            self.gc_paused = True
+            return
+        
+        with self.mailbox_lock:
+            self.gc_paused = True
+            if not self.network_busy:
+                gc.disable()
+    
+    def resume_gc(self):
+        """Hand automatic GC back to the runtime"""
+        if not self.mailbox_lock:
+            gc.enable()
+            self.gc_paused = False
+            return
+        
+        with self.mailbox_lock:
+            gc.enable()
+            self.gc_paused = False
+    
+    def service_network(self, now, allow_while_playing):
+        """WiFi retry, connection check and periodic fetch - one non-blocking step"""
+        # The network thread runs during playback (begin_network_work gates it on GC)
+        idle = allow_while_playing or not self.playing
+        
+        # Check if it's time to retry WiFi connection
+        if (not self.wifi_connected and 
+            not self.wifi_connecting and 
+            idle and
+            time.ticks_diff(now, self.last_wifi_check) >= self.wifi_check_interval):
+            self.last_wifi_check = now
+            self.setup_wifi()
+        
+        # Check if it's time to fetch new message (every 10 minutes when connected)
+        if (self.wifi_connected and 
+            idle and
+            (self.fetch_pending or
+             time.ticks_diff(now, self.last_message_fetch) >= self.message_fetch_interval)):
+            print("Fetching updated message...")
+            self.fetch_pending = False
+            self.fetch_message()
+        
+        # Check WiFi connection status (non-blocking)
+        if self.wifi_connecting:
+            self.check_wifi_connection()
+    
+    def network_worker(self):
+        """Network thread body - runs until network_running is cleared"""
+        print("Network thread started")
+        while self.network_running:
+            self.network_step()
+            time.sleep_ms(NETWORK_POLL_MS)
+        print("Network thread stopped")
+    
+    def network_step(self):
+        """One worker pass - skipped entirely while playback has GC paused"""
+        if not self.begin_network_work():
+            return
+        try:
+            self.service_network(time.ticks_ms(), True)
+        except Exception as e:
+            print(f"Network thread error: {e}")
+        finally:
+            self.end_network_work()
+    
+    def start_network_thread(self):
+        """Start the network worker on its own thread with a TLS-sized stack"""
+        self.network_running = True
+        previous = _thread.stack_size(NETWORK_THREAD_STACK)
+        try:
+            _thread.start_new_thread(self.network_worker, ())
+        finally:
+            _thread.stack_size(previous)
+    
+    def stop_network_thread(self):
+        """Ask the network worker to exit after its current step"""
+        self.network_running = False
+    
+    def update_heap_high_water(self):
+        """Record the highest heap usage seen so far"""
+        try:
+            used = gc.mem_alloc()
+        except AttributeError:
+            return  # Not available off-device
+        if used > self.heap_high_water:
+            self.heap_high_water = used
+    
+    def collect_garbage(self):
+        """Run a full collection at a safe point (never in the middle of a note)"""
+        self.update_heap_high_water()
+        gc.collect()
+    
+    def heap_free(self):
+        """Free heap in bytes, None when not available off-device"""
+        try:
+            return gc.mem_free()
+        except AttributeError:
+            return None
+    
+    def check_heap(self):
+        """Main loop: track the high-water mark and collect if the heap is about to run dry"""
+        self.update_heap_high_water()
+        # Automatic GC is off while playing - don't let the heap run dry
+        free = self.heap_free()
+        if self.playing and free is not None and free < GC_EMERGENCY_FREE:
+            gc.collect()
+    
+    def heap_report(self):
+        """Print and return current heap usage and the high-water mark"""
+        self.update_heap_high_water()
+        try:
+            used = gc.mem_alloc()
+        except AttributeError:
+            used = -1
+        free = self.heap_free()
+        if free is None:
+            free = -1
+        print(f"Heap: used {used}, free {free}, high water {self.heap_high_water}")
+        return used, free, self.heap_high_water
     
     def display_message(self):
         """Display birthday message on OLED"""
         self.oled.fill(0)  # Clear display
         
         # Display message lines (centered)
-        start_y = 10 if len(self.message_lines) <= 2 else 5
-        for i, line in enumerate(self.message_lines):
+        start_y = 10 if self.line_count <= 2 else 5
+        for i in range(self.line_count):
+            line = self.message_lines[i]
             # Center text horizontally
             x_pos = max(0, (128 - len(line) * 8) // 2)  # 8 pixels per character
             y_pos = start_y + (i * 12)  # 12 pixels between lines
@@ -307,6 +741,39 @@ class MusicPlayer:
         self.oled.show()
         print("Message displayed")
     
+    def request_redraw(self):
+        """Mark the view dirty - updates arriving before the next frame are coalesced"""
+        if self.view_dirty:
+            self.frames_dropped += 1
+        self.view_dirty = True
+    
+    def ms_until_next_note(self, now):
+        """Time until the sequencer's next note event, None when nothing is playing"""
+        if not self.playing:
+            return None
+        
+        current_durations = durations1 if self.current_song == 0 else durations2
+        if self.note_index >= len(current_durations):
+            return 0
+        return current_durations[self.note_index] - time.ticks_diff(now, self.last_note_time)
+    
+    def update_display(self, now):
+        """Compositor: draw the latest state if dirty, frame interval elapsed and the gap allows"""
+        if not self.view_dirty:
+            return
+        if time.ticks_diff(now, self.last_frame_time) < FRAME_INTERVAL_MS:
+            return
+        
+        # Only push to the bus in a gap between note events
+        remaining = self.ms_until_next_note(now)
+        if remaining is not None and remaining < SHOW_BUDGET_MS:
+            return
+        
+        self.view_dirty = False
+        self.last_frame_time = now
+        self.frames_shown += 1
+        self.display_message()
+    
     def stop_tone(self):
         """Stop buzzer simply and reliably"""
         try:
@@ -340,6 +807,10 @@ class MusicPlayer:
         """Start playing a randomly selected song"""
         # Make sure buzzer is stopped before starting
         self.stop_tone()
+        if self.heap_budget:
+            # Collect now, then keep automatic GC out of the audio path
+            self.collect_garbage()
+            self.pause_gc()
         self.current_song = random.randint(0, 1)
         self.playing = True
         self.note_index = 0
@@ -350,8 +821,16 @@ class MusicPlayer:
         """Stop the current song"""
         self.playing = False
         self.stop_tone()  # Ensure buzzer stops
+        self.end_song_gc()
         print("Song stopped!")
     
+    def end_song_gc(self):
+        """Between songs is a safe point - collect and hand GC back to the runtime"""
+        if self.heap_budget:
+            self.collect_garbage()
+            self.resume_gc()
+            self.heap_report()
+    
     def update_song(self):
         """Update music playback"""
         if not self.playing:
@@ -372,13 +851,15 @@ class MusicPlayer:
             # Song finished - stop everything
             self.playing = False
             self.stop_tone()
+            self.end_song_gc()
             print("Song finished!")
             return
         
         # Check if it's time for the next note
         if time.ticks_diff(now, self.last_note_time) >= current_durations[self.note_index]:
-            # Play current note
-            print(f"Playing tone {current_melody[self.note_index]} for {current_durations[self.note_index]}")
+            # Play current note (skip the per-note string in heap-budget mode)
+            if not self.heap_budget:
+                print(f"Playing tone {current_melody[self.note_index]} for {current_durations[self.note_index]}")
             self.play_tone(current_melody[self.note_index])
             self.note_index += 1
             self.last_note_time = now
@@ -388,6 +869,7 @@ class MusicPlayer:
                 # Song finished
                 self.playing = False
                 self.stop_tone()
+                self.end_song_gc()
                 print("Song finished!")
     
     def check_button(self):
@@ -405,35 +887,32 @@ class MusicPlayer:
     
     def run(self):
         """Main application loop"""
+        if self.network_thread:
+            self.start_network_thread()
+        
         while True:
             current_time = time.ticks_ms()
             
-            # Check if it's time to retry WiFi connection (but not while playing music)
-            if (not self.wifi_connected and 
-                not self.wifi_connecting and 
-                not self.playing and  # Don't scan WiFi while music is playing
-                time.ticks_diff(current_time, self.last_wifi_check) >= self.wifi_check_interval):
-                self.last_wifi_check = current_time
-                self.setup_wifi()
-            
-            # Check if it's time to fetch new message (every 10 minutes when connected and not playing)
-            if (self.wifi_connected and 
-                not self.playing and
-                time.ticks_diff(current_time, self.last_message_fetch) >= self.message_fetch_interval):
-                print("Fetching updated message...")
-                self.fetch_message()
-            
-            # Check WiFi connection status (non-blocking)
-            if self.wifi_connecting:
-                self.check_wifi_connection()
+            if self.network_thread:
+                # Pick up whatever the network thread finished
+                self.poll_mailbox()
+            else:
+                # Network work shares this loop, so don't scan or fetch while music is playing
+                self.service_network(current_time, False)
             
             # Always check button and update music - never block these!
             self.check_button()
             self.update_song()
+            self.update_display(time.ticks_ms())
+            
+            if self.heap_budget:
+                self.check_heap()
+            
             time.sleep_ms(50)
 
 # Run the music player
 def main():
+    player = None
     try:
         player = MusicPlayer()
         player.run()
@@ -441,6 +920,9 @@ def main():
         print("Stopping music player...")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        if player:
+            player.stop_network_thread()
 
 if __name__ == "__main__":
     main()
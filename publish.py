@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Fleet Message Publisher for ESP32 Birthday Player
+Encrypts a message per device (each with its own key) and writes one file
+per device plus a manifest of content hashes for the devices to poll
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from encrypt import MessageEncrypter
+
+MANIFEST_NAME = "manifest.json"
+# Ids become file names and URL path segments
+DEVICE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def encrypt_device(device):
+    """Encrypt one device's message with its own key, returns (id, hex, sha256)"""
+    encrypter = MessageEncrypter(device["key"])
+    encrypted = encrypter.encrypt_message(device["message"])
+    digest = hashlib.sha256(encrypted.encode('utf-8')).hexdigest()
+    return device["id"], encrypted, digest
+
+
+def load_devices(path):
+    """Load the device list: a JSON list of {"id", "key", "message"} objects"""
+    with open(path, encoding='utf-8') as f:
+        devices = json.load(f)
+    validate_devices(devices)
+    return devices
+
+
+def validate_devices(devices):
+    """Reject malformed entries, unsafe ids, unencodable text and duplicates with ValueError"""
+    if not isinstance(devices, list):
+        raise ValueError("Device file must contain a JSON list")
+
+    seen = set()
+    for device in devices:
+        if not isinstance(device, dict):
+            raise ValueError(f"Device entry must be an object: {device!r}")
+        for field in ("id", "key", "message"):
+            if not isinstance(device.get(field), str) or not device[field]:
+                raise ValueError(f"Device entry missing '{field}': {device}")
+        if not DEVICE_ID_PATTERN.fullmatch(device["id"]):
+            raise ValueError(f"Invalid device id (use letters, digits, '_' or '-'): {device['id']!r}")
+        # The cipher XORs one byte per character - the device matches keys byte for byte
+        if not device["key"].isascii():
+            raise ValueError(f"Key for device {device['id']} must be ASCII")
+        try:
+            device["message"].encode('latin-1')
+        except UnicodeEncodeError as e:
+            raise ValueError(f"Message for device {device['id']} has a character the cipher can't encode "
+                             f"(only Latin-1, U+0000-U+00FF): {device['message'][e.start]!r}")
+        if device["id"] in seen:
+            raise ValueError(f"Duplicate device id: {device['id']}")
+        seen.add(device["id"])
+
+
+def load_manifest(out_dir):
+    """Load the previously published manifest, or an empty one"""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def publish(devices, out_dir, workers=None):
+    """Encrypt all devices in parallel and rewrite only files whose content changed
+
+    Returns (changed, removed) device ids. Files of devices dropped from the
+    list are deleted.
+    """
+    validate_devices(devices)
+    os.makedirs(out_dir, exist_ok=True)
+    old_manifest = load_manifest(out_dir)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(encrypt_device, devices))
+
+    manifest = {}
+    changed = []
+    for device_id, encrypted, digest in results:
+        file_name = f"{device_id}.txt"
+        file_path = os.path.join(out_dir, file_name)
+        manifest[device_id] = digest
+
+        # Skip the write if the hash matches and the file is still on disk
+        if old_manifest.get(device_id) == digest and os.path.exists(file_path):
+            continue
+
+        with open(file_path, "w", encoding='utf-8') as f:
+            f.write(encrypted)
+        changed.append(device_id)
+
+    removed = []
+    for device_id in old_manifest:
+        # Old ids come from disk - only touch names publish() could have written
+        if device_id in manifest or not DEVICE_ID_PATTERN.fullmatch(device_id):
+            continue
+        file_path = os.path.join(out_dir, f"{device_id}.txt")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        removed.append(device_id)
+
+    if manifest != old_manifest:
+        with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    return changed, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish per-device encrypted messages")
+    parser.add_argument("devices", help="JSON file with a list of {id, key, message}")
+    parser.add_argument("-o", "--out", default="messages", help="output directory (default: messages)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    devices = load_devices(args.devices)
+    changed, removed = publish(devices, args.out, args.workers)
+
+    print(f"📦 Published {len(devices)} devices to {args.out}/")
+    if changed:
+        print(f"✅ Updated: {', '.join(changed)}")
+    if removed:
+        print(f"🗑️  Removed: {', '.join(removed)}")
+    if not changed and not removed:
+        print("✅ Nothing changed")
+    print(f"📋 Commit and push {args.out}/ - each ESP32 only downloads its file when its hash changes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Host stand-ins for the MicroPython modules main.py imports, so MusicPlayer
+can be built and driven on CPython with a virtual clock
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class FakePin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+
+    def __init__(self, pin, mode=None, pull=None):
+        self.pin = pin
+        self.level = 1
+
+    def value(self):
+        return self.level
+
+
+class FakePWM:
+    def __init__(self, pin, freq=0, duty=0):
+        self.current_freq = freq
+        self.current_duty = duty
+
+    def freq(self, value):
+        self.current_freq = value
+
+    def duty(self, value):
+        self.current_duty = value
+
+
+class FakeI2C:
+    def __init__(self, bus, sda=None, scl=None, freq=0):
+        pass
+
+
+class FakeOLED:
+    """Records show() calls against the virtual clock"""
+
+    clock = None
+
+    def __init__(self, width, height, i2c, addr=0x3C):
+        self.shows = []
+
+    def fill(self, color):
+        pass
+
+    def text(self, string, x, y):
+        pass
+
+    def show(self):
+        self.shows.append(self.clock.now if self.clock else None)
+
+
+class FakeWLAN:
+    def __init__(self, interface):
+        pass
+
+    def active(self, state):
+        pass
+
+    def scan(self):
+        return []
+
+    def isconnected(self):
+        return False
+
+
+def fake_get(url):
+    raise OSError("no network on host")
+
+
+def install_stand_ins():
+    """Register stub machine/network/urequests/ssd1306 modules"""
+    machine = types.ModuleType("machine")
+    machine.Pin = FakePin
+    machine.PWM = FakePWM
+    machine.I2C = FakeI2C
+
+    network = types.ModuleType("network")
+    network.STA_IF = 0
+    network.WLAN = FakeWLAN
+
+    urequests = types.ModuleType("urequests")
+    urequests.get = fake_get
+
+    ssd1306 = types.ModuleType("ssd1306")
+    ssd1306.SSD1306_I2C = FakeOLED
+
+    for module in (machine, network, urequests, ssd1306):
+        sys.modules.setdefault(module.__name__, module)
+
+
+install_stand_ins()
+
+
+class FakeClock:
+    """Virtual replacement for MicroPython's time.ticks_ms family"""
+
+    def __init__(self):
+        self.now = 0
+
+    def ticks_ms(self):
+        return self.now
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def sleep_ms(self, ms):
+        self.now += ms
+
+    def advance(self, ms):
+        self.now += ms
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import main
+
+    fake = FakeClock()
+    monkeypatch.setattr(main, "time", fake)
+    monkeypatch.setattr(FakeOLED, "clock", fake)
+    return fake
+
+
+@pytest.fixture
+def make_player(clock, monkeypatch):
+    """Build a MusicPlayer on the stand-ins, optionally with config overrides"""
+    import main
+
+    def build(**config):
+        for name, value in config.items():
+            monkeypatch.setattr(main, name, value)
+        return main.MusicPlayer()
+
+    return build
@@ -0,0 +1,143 @@
+"""Device side of fleet mode: manifest check, hash verification and backoff"""
+
+import hashlib
+import io
+import json
+
+import pytest
+
+import main
+from encrypt import MessageEncrypter
+
+DEVICE = "unit-7"
+KEY = "UnitKey7"
+MESSAGE_URL = main.MESSAGES_BASE_URL + DEVICE + ".txt"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = body
+        self.raw = io.BytesIO(body)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    """Serves a manifest and message files, logging every request"""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+
+    def publish(self, message, stale=None):
+        """Put a message up; stale serves an older message body under the new hash"""
+        encrypted = MessageEncrypter(KEY).encrypt_message(message)
+        digest = hashlib.sha256(encrypted.encode()).hexdigest()
+        served = MessageEncrypter(KEY).encrypt_message(stale) if stale else encrypted
+        self.files[main.MANIFEST_URL] = json.dumps({DEVICE: digest}).encode()
+        self.files[MESSAGE_URL] = served.encode()
+
+    def get(self, url):
+        self.requests.append(url)
+        if url not in self.files:
+            return FakeResponse(404, b"")
+        return FakeResponse(200, self.files[url])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeServer()
+    monkeypatch.setattr(main.urequests, "get", fake.get)
+    return fake
+
+
+@pytest.fixture(params=[False, True], ids=["legacy", "heap-budget"])
+def fleet_player(request, make_player):
+    player = make_player(DEVICE_ID=DEVICE, ENCRYPTION_KEY=KEY, HEAP_BUDGET_MODE=request.param)
+    player.wifi_connected = True
+    return player
+
+
+def shown(player):
+    return list(player.message_lines[:player.line_count])
+
+
+def test_new_hash_downloads_and_applies(fleet_player, server):
+    server.publish("hello fleet")
+
+    fleet_player.fetch_message()
+
+    assert shown(fleet_player) == ["hello fleet"]
+    assert server.requests == [main.MANIFEST_URL, MESSAGE_URL]
+
+
+def test_unchanged_hash_skips_download(fleet_player, server):
+    server.publish("hello fleet")
+    fleet_player.fetch_message()
+    del server.requests[:]
+
+    fleet_player.fetch_message()
+
+    assert server.requests == [main.MANIFEST_URL]
+    assert shown(fleet_player) == ["hello fleet"]
+
+
+def test_stale_file_is_not_applied(fleet_player, server):
+    server.publish("first")
+    fleet_player.fetch_message()
+
+    # New manifest, but the CDN still serves the old body
+    server.publish("second", stale="first")
+    fleet_player.fetch_message()
+    assert shown(fleet_player) == ["first"]
+
+    # Once the CDN catches up the new message goes through
+    server.publish("second")
+    fleet_player.fetch_message()
+    assert shown(fleet_player) == ["second"]
+
+
+def test_tampered_body_is_not_applied(fleet_player, server):
+    server.publish("real")
+    server.files[MESSAGE_URL] = MessageEncrypter(KEY).encrypt_message("fake").encode()
+
+    fleet_player.fetch_message()
+
+    assert shown(fleet_player) == main.DEFAULT_MESSAGE_LINES
+    assert fleet_player.message_hash is None
+
+
+@pytest.mark.parametrize("manifest", [None, {"other-unit": "00"}], ids=["manifest-404", "id-missing"])
+def test_manifest_failure_backs_off(fleet_player, server, clock, manifest):
+    if manifest is not None:
+        server.files[main.MANIFEST_URL] = json.dumps(manifest).encode()
+    clock.advance(fleet_player.message_fetch_interval)
+
+    # Five seconds of 50 ms main-loop passes
+    for _ in range(100):
+        clock.advance(50)
+        fleet_player.service_network(clock.ticks_ms(), False)
+
+    assert server.requests == [main.MANIFEST_URL]
+
+    clock.advance(fleet_player.message_fetch_interval)
+    fleet_player.service_network(clock.ticks_ms(), False)
+    assert server.requests == [main.MANIFEST_URL] * 2
+
+
+def test_latin1_key_decrypts_in_both_modes(make_player, monkeypatch):
+    key = "clé"
+    body = MessageEncrypter(key).encrypt_message("hello there")
+    legacy = make_player(ENCRYPTION_KEY=key)
+    budget = make_player(ENCRYPTION_KEY=key, HEAP_BUDGET_MODE=True)
+
+    budget.fetch_buf[:len(body)] = body.encode()
+    count = budget.xor_decrypt_into(len(body))
+
+    assert legacy.xor_decrypt(body) == "hello there"
+    assert bytes(budget.decrypt_buf[:count]) == b"hello there"
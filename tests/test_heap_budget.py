@@ -0,0 +1,135 @@
+"""Heap-budget mode: GC only at safe points, with a stubbed gc module"""
+
+import pytest
+
+import main
+
+
+class FakeGC:
+    """Stand-in for MicroPython's gc with a settable heap"""
+
+    def __init__(self):
+        self.enabled = True
+        self.collections = 0
+        self.used = 10000
+        self.free = 50000
+
+    def collect(self):
+        self.collections += 1
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def isenabled(self):
+        return self.enabled
+
+    def mem_alloc(self):
+        return self.used
+
+    def mem_free(self):
+        return self.free
+
+
+class HostGC:
+    """CPython's gc - no mem_alloc/mem_free"""
+
+    def __init__(self):
+        self.enabled = True
+
+    def collect(self):
+        pass
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+
+@pytest.fixture
+def fake_gc(monkeypatch):
+    fake = FakeGC()
+    monkeypatch.setattr(main, "gc", fake)
+    return fake
+
+
+def test_start_song_collects_then_disables_gc(make_player, fake_gc):
+    player = make_player(HEAP_BUDGET_MODE=True)
+    before = fake_gc.collections
+
+    player.start_song()
+
+    assert fake_gc.collections == before + 1
+    assert not fake_gc.enabled
+    assert player.gc_paused
+
+
+def test_song_end_reenables_gc_and_reports(make_player, fake_gc, clock, capsys):
+    player = make_player(HEAP_BUDGET_MODE=True)
+    player.start_song()
+    player.current_song = 0
+    fake_gc.used = 30000
+
+    while player.playing:
+        clock.advance(50)
+        player.update_song()
+
+    assert fake_gc.enabled
+    assert not player.gc_paused
+    assert player.heap_high_water == 30000
+    assert "Heap: used 30000" in capsys.readouterr().out
+
+
+def test_stop_song_reenables_gc(make_player, fake_gc):
+    player = make_player(HEAP_BUDGET_MODE=True)
+    player.start_song()
+    collections = fake_gc.collections
+
+    player.stop_song()
+
+    assert fake_gc.enabled
+    assert fake_gc.collections == collections + 1
+
+
+def test_emergency_collect_only_when_playing_and_low(make_player, fake_gc):
+    player = make_player(HEAP_BUDGET_MODE=True)
+    fake_gc.free = main.GC_EMERGENCY_FREE - 1
+    collections = fake_gc.collections
+
+    player.check_heap()
+    assert fake_gc.collections == collections  # not playing - automatic GC handles it
+
+    player.start_song()
+    collections = fake_gc.collections
+    fake_gc.free = main.GC_EMERGENCY_FREE
+    player.check_heap()
+    assert fake_gc.collections == collections
+
+    fake_gc.free = main.GC_EMERGENCY_FREE - 1
+    player.check_heap()
+    assert fake_gc.collections == collections + 1
+
+
+def test_heap_probes_work_off_device(make_player, monkeypatch):
+    host_gc = HostGC()
+    monkeypatch.setattr(main, "gc", host_gc)
+    player = make_player(HEAP_BUDGET_MODE=True)
+
+    player.start_song()
+    player.check_heap()
+    assert player.heap_report() == (-1, -1, 0)
+    player.stop_song()
+    assert host_gc.enabled
+
+
+def test_budget_off_leaves_gc_alone(make_player, fake_gc):
+    player = make_player()
+
+    player.start_song()
+    player.stop_song()
+
+    assert fake_gc.enabled
+    assert fake_gc.collections == 0
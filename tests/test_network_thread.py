@@ -0,0 +1,224 @@
+"""Network thread mode: mailbox races on CPython threads, display ownership, GC gating"""
+
+import sys
+import threading
+import types
+
+import pytest
+
+import main
+from conftest import FakeWLAN
+from test_heap_budget import FakeGC
+
+MESSAGES = 20000
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_mailbox_newest_wins_and_never_tears(make_player, fast_switching):
+    player = make_player(NETWORK_THREAD_MODE=True)
+    done = threading.Event()
+    seen = [[], []]
+    torn = []
+
+    def producer():
+        for i in range(MESSAGES):
+            # Both lines carry the sequence number, so a torn read would show a mismatch
+            player.post_message_lines([str(i), str(i)])
+        done.set()
+
+    def consumer(out):
+        while True:
+            finished = done.is_set()
+            lines = player.take_message_lines()
+            if lines is not None:
+                if lines[0] != lines[1]:
+                    torn.append(lines)
+                out.append(int(lines[0]))
+            elif finished:
+                return
+
+    threads = [threading.Thread(target=producer)]
+    threads += [threading.Thread(target=consumer, args=(out,)) for out in seen]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not torn
+    for out in seen:
+        assert out == sorted(set(out))  # each consumer only ever moves forward
+    taken = seen[0] + seen[1]
+    assert len(taken) == len(set(taken))  # no message handed out twice
+    assert max(taken) == MESSAGES - 1     # the newest message is never lost
+    assert player.take_message_lines() is None
+
+
+def test_wifi_change_reaches_display_through_main_loop(make_player, monkeypatch):
+    player = make_player(NETWORK_THREAD_MODE=True)
+    monkeypatch.setattr(FakeWLAN, "isconnected", lambda self: True)
+    monkeypatch.setattr(player, "fetch_message", lambda: None)
+    player.wifi_connecting = True
+
+    worker = threading.Thread(target=player.check_wifi_connection)
+    worker.start()
+    worker.join()
+
+    # The worker only flags the change - the view is marked dirty on the main thread
+    assert player.wifi_connected
+    assert not player.view_dirty
+    player.poll_mailbox()
+    assert player.view_dirty
+    assert not player.take_wifi_changed()
+
+
+def test_worker_holds_off_network_while_gc_is_paused(make_player, clock, monkeypatch):
+    player = make_player(NETWORK_THREAD_MODE=True, HEAP_BUDGET_MODE=True)
+    fetches = []
+    monkeypatch.setattr(main, "gc", FakeGC())
+    monkeypatch.setattr(player, "fetch_message", lambda: fetches.append(clock.now))
+    monkeypatch.setattr(FakeWLAN, "isconnected", lambda self: True)
+    player.wifi_connected = True
+    clock.advance(player.message_fetch_interval)
+
+    player.start_song()
+    assert player.gc_paused
+    player.network_step()
+    assert not fetches
+
+    # A connect completing as the song starts defers its fetch
+    player.wifi_connected = False
+    player.wifi_connecting = True
+    player.check_wifi_connection()
+    assert not fetches and player.fetch_pending
+
+    player.stop_song()
+    assert main.gc.enabled
+    player.last_message_fetch = clock.ticks_ms()  # interval not due - only the pending fetch
+    player.network_step()
+    assert len(fetches) == 1
+    assert not player.fetch_pending
+
+
+def test_song_starting_mid_fetch_defers_gc_disable(make_player, monkeypatch):
+    player = make_player(NETWORK_THREAD_MODE=True, HEAP_BUDGET_MODE=True)
+    fake_gc = FakeGC()
+    monkeypatch.setattr(main, "gc", fake_gc)
+
+    assert player.begin_network_work()  # worker is mid-fetch
+    player.start_song()
+    assert player.gc_paused and fake_gc.enabled  # still allocating - keep automatic GC on
+
+    player.end_network_work()
+    assert not fake_gc.enabled  # pause applied once the worker is done
+    assert not player.begin_network_work()
+
+    player.stop_song()
+    assert player.begin_network_work()
+    player.end_network_work()
+    assert fake_gc.enabled  # a worker finishing after the song doesn't re-disable
+
+
+def test_worker_never_collects(make_player, monkeypatch):
+    player = make_player(NETWORK_THREAD_MODE=True, HEAP_BUDGET_MODE=True)
+    fake_gc = FakeGC()
+    monkeypatch.setattr(main, "gc", fake_gc)
+    player.wifi_connected = True
+
+    worker = threading.Thread(target=player.fetch_message)  # host urequests raises - still a finished fetch
+    worker.start()
+    worker.join()
+    assert fake_gc.collections == 0
+
+    # The main loop collects at its own safe point, and not during a song
+    player.playing = True
+    player.poll_mailbox()
+    assert fake_gc.collections == 0
+    player.playing = False
+
+    player.post_gc_request()
+    player.poll_mailbox()
+    assert fake_gc.collections == 1
+
+
+def test_worker_fetches_during_playback_without_heap_budget(make_player, clock, monkeypatch):
+    player = make_player(NETWORK_THREAD_MODE=True)
+    fetches = []
+    monkeypatch.setattr(player, "fetch_message", lambda: fetches.append(clock.now))
+    player.wifi_connected = True
+    clock.advance(player.message_fetch_interval)
+
+    player.start_song()
+    player.service_network(clock.ticks_ms(), True)
+    assert len(fetches) == 1
+
+    # The main-loop path keeps the old "not while playing" gating
+    clock.advance(player.message_fetch_interval)
+    player.service_network(clock.ticks_ms(), False)
+    assert len(fetches) == 1
+    player.stop_song()
+
+
+def test_worker_thread_gets_tls_sized_stack(make_player, monkeypatch):
+    # CPython's minimum stack is 32 KiB, so use a size both runtimes accept
+    player = make_player(NETWORK_THREAD_MODE=True, NETWORK_THREAD_STACK=64 * 1024)
+    sizes = []
+    started = []
+
+    def stack_size(size=0):
+        sizes.append(size)
+        return 0
+
+    fake_thread = types.SimpleNamespace(
+        stack_size=stack_size,
+        start_new_thread=lambda func, args: started.append(sizes[-1]),
+    )
+    monkeypatch.setattr(main, "_thread", fake_thread)
+    player.start_network_thread()
+
+    assert started == [64 * 1024]
+    assert sizes == [64 * 1024, 0]  # default restored for any later threads
+    player.stop_network_thread()
+
+
+def test_stop_network_thread_ends_worker(make_player, monkeypatch):
+    player = make_player(NETWORK_THREAD_MODE=True, NETWORK_THREAD_STACK=64 * 1024)
+    stepped = threading.Event()
+    stopped = threading.Event()
+
+    def service(now, allow_while_playing):
+        stepped.set()
+
+    original_worker = player.network_worker
+    def worker():
+        original_worker()
+        stopped.set()
+
+    monkeypatch.setattr(player, "service_network", service)
+    monkeypatch.setattr(player, "network_worker", worker)
+    player.start_network_thread()
+    assert stepped.wait(5)
+
+    player.stop_network_thread()
+    assert stopped.wait(5)
+
+
+def test_main_stops_network_thread_on_interrupt(clock, monkeypatch):
+    players = []
+
+    def run(self):
+        players.append(self)
+        self.network_running = True
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, "NETWORK_THREAD_MODE", True)
+    monkeypatch.setattr(main.MusicPlayer, "run", run)
+    main.main()
+
+    assert players and not players[0].network_running
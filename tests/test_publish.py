@@ -0,0 +1,83 @@
+"""Fleet publisher: incremental writes, stale-file cleanup and device list validation"""
+
+import json
+import os
+
+import pytest
+
+from encrypt import MessageEncrypter
+from publish import MANIFEST_NAME, publish, validate_devices
+
+OLD = 1_000_000_000  # a past mtime, so any rewrite shows up
+
+
+def devices(*entries):
+    return [{"id": i, "key": k, "message": m} for i, k, m in entries]
+
+
+def age(path):
+    os.utime(path, (OLD, OLD))
+
+
+def is_untouched(path):
+    return os.stat(path).st_mtime == OLD
+
+
+def read_manifest(out):
+    with open(out / MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+def test_publish_writes_files_and_manifest(tmp_path):
+    changed, removed = publish(devices(("a", "k1", "hi there"), ("b", "k2", "yo")), tmp_path, workers=2)
+
+    assert sorted(changed) == ["a", "b"] and removed == []
+    assert (tmp_path / "a.txt").read_text() == MessageEncrypter("k1").encrypt_message("hi there")
+    assert set(read_manifest(tmp_path)) == {"a", "b"}
+
+
+def test_unchanged_files_and_manifest_are_not_rewritten(tmp_path):
+    publish(devices(("a", "k1", "hi"), ("b", "k2", "yo")), tmp_path, workers=2)
+    for name in ("a.txt", "b.txt", MANIFEST_NAME):
+        age(tmp_path / name)
+
+    changed, removed = publish(devices(("a", "k1", "hi"), ("b", "k2", "yo")), tmp_path, workers=2)
+    assert changed == [] and removed == []
+    assert all(is_untouched(tmp_path / name) for name in ("a.txt", "b.txt", MANIFEST_NAME))
+
+    changed, _ = publish(devices(("a", "k1", "hi"), ("b", "k2", "hey")), tmp_path, workers=2)
+    assert changed == ["b"]
+    assert is_untouched(tmp_path / "a.txt")
+    assert not is_untouched(tmp_path / "b.txt")
+    assert not is_untouched(tmp_path / MANIFEST_NAME)
+
+
+def test_dropped_device_file_is_deleted(tmp_path):
+    publish(devices(("a", "k1", "hi"), ("b", "k2", "yo")), tmp_path, workers=2)
+
+    changed, removed = publish(devices(("a", "k1", "hi")), tmp_path, workers=2)
+
+    assert changed == [] and removed == ["b"]
+    assert not (tmp_path / "b.txt").exists()
+    assert set(read_manifest(tmp_path)) == {"a"}
+
+
+@pytest.mark.parametrize("bad", [
+    {"devices": {"id": "a"}},
+    ["a"],
+    devices(("../x", "k", "m")),
+    devices(("a b", "k", "m")),
+    devices(("a", "k", "m"), ("a", "k", "n")),
+    devices(("a", "", "m")),
+    devices(("a", "clé", "m")),
+    devices(("a", "k", "love ❤")),
+])
+def test_bad_device_lists_are_rejected(bad):
+    with pytest.raises(ValueError):
+        validate_devices(bad)
+
+
+def test_publish_rejects_before_writing(tmp_path):
+    with pytest.raises(ValueError, match="Latin-1"):
+        publish(devices(("a", "k", "love ❤")), tmp_path)
+    assert not (tmp_path / MANIFEST_NAME).exists()
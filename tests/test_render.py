@@ -0,0 +1,63 @@
+"""Compositor timing checks against the virtual clock"""
+
+import main
+
+
+def step(player, clock, ms=10):
+    """One slice of the main loop without the network work"""
+    clock.advance(ms)
+    player.check_button()
+    player.update_song()
+    player.update_display(clock.ticks_ms())
+
+
+def test_burst_of_redraws_collapses_into_one_show(make_player, clock):
+    player = make_player()
+    shows = player.oled.shows
+    before = len(shows)
+
+    clock.advance(main.FRAME_INTERVAL_MS)
+    for _ in range(10):
+        player.request_redraw()
+    player.update_display(clock.ticks_ms())
+    player.update_display(clock.ticks_ms())
+
+    assert len(shows) == before + 1
+    assert player.frames_dropped == 9
+    assert not player.view_dirty
+
+
+def test_at_most_one_frame_per_interval(make_player, clock):
+    player = make_player()
+    shows = player.oled.shows
+    del shows[:]
+
+    for _ in range(300):
+        player.request_redraw()
+        step(player, clock)
+
+    assert len(shows) > 1
+    for earlier, later in zip(shows, shows[1:]):
+        assert later - earlier >= main.FRAME_INTERVAL_MS
+
+
+def test_show_only_in_gaps_between_notes(make_player, clock):
+    player = make_player()
+    shows = player.oled.shows
+    del shows[:]
+
+    # Fail as soon as a frame lands too close to the next note event
+    real_show = player.oled.show
+    def checked_show():
+        remaining = player.ms_until_next_note(clock.ticks_ms())
+        assert remaining is None or remaining >= main.SHOW_BUDGET_MS
+        real_show()
+    player.oled.show = checked_show
+
+    player.start_song()
+    player.current_song = 1  # the long melody, mixed note lengths
+    while player.playing:
+        player.request_redraw()
+        step(player, clock)
+
+    assert shows  # frames still got through during playback